@@ -1,29 +1,54 @@
 from __future__ import annotations
 
+import logging
+import os
 from contextlib import asynccontextmanager
+from typing import Any
 
+import orjson
+from anyio import CapacityLimiter, create_task_group, to_thread
 from fastapi import FastAPI, HTTPException, Query, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import PlainTextResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import TypeAdapter
 
 from .schemas import (
     Chem3DRequest,
     Chem3DResponse,
+    ChemParseBatchItem,
+    ChemParseBatchRequest,
+    ChemParseBatchResponse,
+    ChemParseBatchResult,
     ChemParseRequest,
     ChemParseResponse,
     ClaimRequest,
     ErrorResponse,
+    QCResult,
     ReviewRequest,
     SubmitRequest,
     Task,
     TaskCreateRequest,
     TaskSeed,
 )
-from .services.qc_service import parse_and_qc
-from .services.rdkit_service import generate_3d_molblock
+from .services.qc_service import cached_parse_and_qc, parse_and_sanitize
+from .services.rdkit_service import build_molecule, canonical_smiles, generate_3d_molblock
 from .storage import TaskStore
 
-store = TaskStore()
+logger = logging.getLogger(__name__)
+
+# 数据文件路径可由环境变量 TASKS_DB_FILE 指定（测试用它把数据写到临时目录）
+store = TaskStore(os.environ.get("TASKS_DB_FILE", "tasks.json"))
+
+
+class ORJSONResponse(JSONResponse):
+    """使用 orjson（C 扩展）序列化的 JSON 响应"""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+# RDKit 计算（含批量解析的每一条）的并发上限：按 CPU 核数限流，避免慢请求占满默认线程池
+_rdkit_limiter = CapacityLimiter(os.cpu_count() or 4)
 
 
 @asynccontextmanager
@@ -41,10 +66,19 @@ async def lifespan(_: FastAPI):
         TaskSeed(title="Mol-0010", source_smiles="CC(=O)C"),
     ]
     store.seed(seeds)
+    # 预热 RDKit：SMILES 解析、芳香性感知、ETKDG 嵌入与力场参数只在启动时初始化一次
+    generate_3d_molblock(build_molecule("CCO", None).mol)
     yield
+    # 退出前写一次快照并关闭日志，下次启动无需重放整份日志
+    store.close()
 
 
-app = FastAPI(title="分子标注 Demo", version="0.1.0", lifespan=lifespan)
+app = FastAPI(
+    title="分子标注 Demo",
+    version="0.1.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+)
 
 app.add_middleware(
     CORSMiddleware,
@@ -56,7 +90,8 @@ app.add_middleware(
 
 
 def respond_error(code: str, message: str, detail: str | None = None) -> dict:
-    return ErrorResponse(code=code, message=message, detail=detail).model_dump()
+    # 与 ErrorResponse 字段一致；直接返回 dict，避免每次报错都走一遍 Pydantic 校验
+    return {"code": code, "message": message, "detail": detail}
 
 
 @app.post(
@@ -64,9 +99,11 @@ def respond_error(code: str, message: str, detail: str | None = None) -> dict:
     response_model=ChemParseResponse,
     responses={400: {"model": ErrorResponse}},
 )
-def chem_parse(payload: ChemParseRequest) -> ChemParseResponse:
-    qc, canonical, molblock, result = parse_and_qc(payload.smiles, payload.mol)
-    if not result.mol:
+async def chem_parse(payload: ChemParseRequest) -> ChemParseResponse:
+    qc, canonical, molblock = await to_thread.run_sync(
+        cached_parse_and_qc, payload.smiles, payload.mol, limiter=_rdkit_limiter
+    )
+    if not qc.rdkit_parse_ok:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=respond_error("parse_failure", "无法解析分子结构"),
@@ -74,14 +111,55 @@ def chem_parse(payload: ChemParseRequest) -> ChemParseResponse:
     return ChemParseResponse(ok=qc.sanitize_ok, canonical_smiles=canonical, molblock=molblock, qc=qc)
 
 
+def _failed_batch_item(code: str, message: str) -> ChemParseBatchResult:
+    return ChemParseBatchResult(
+        ok=False,
+        canonical_smiles=None,
+        molblock=None,
+        qc=QCResult(rdkit_parse_ok=False, sanitize_ok=False),
+        error=ErrorResponse(code=code, message=message),
+    )
+
+
+def _parse_batch_item(item: ChemParseBatchItem) -> ChemParseBatchResult:
+    if not item.smiles and not item.mol:
+        return _failed_batch_item("missing_input", "smiles 与 mol 至少提供一个")
+    try:
+        qc, canonical, molblock = cached_parse_and_qc(item.smiles, item.mol)
+    except Exception:
+        # 内部异常只记日志，不把原始异常信息返回给客户端
+        logger.exception("批量解析单条结构失败")
+        return _failed_batch_item("internal_error", "解析过程异常")
+    error = None
+    if not qc.rdkit_parse_ok:
+        error = ErrorResponse(code="parse_failure", message="无法解析分子结构")
+    return ChemParseBatchResult(
+        ok=qc.sanitize_ok, canonical_smiles=canonical, molblock=molblock, qc=qc, error=error
+    )
+
+
+@app.post("/api/chem/parse_batch", response_model=ChemParseBatchResponse)
+async def chem_parse_batch(payload: ChemParseBatchRequest) -> ChemParseBatchResponse:
+    # RDKit 解析期间会释放 GIL，逐条交给线程并行，与单条接口共用同一个限流器
+    results: list[ChemParseBatchResult | None] = [None] * len(payload.items)
+
+    async def run(index: int, item: ChemParseBatchItem) -> None:
+        results[index] = await to_thread.run_sync(_parse_batch_item, item, limiter=_rdkit_limiter)
+
+    async with create_task_group() as tg:
+        for index, item in enumerate(payload.items):
+            tg.start_soon(run, index, item)
+    return ChemParseBatchResponse(results=results)
+
+
 @app.post(
     "/api/chem/3d",
     response_model=Chem3DResponse,
     responses={400: {"model": ErrorResponse}},
 )
-def chem_3d(payload: Chem3DRequest) -> Chem3DResponse:
-    qc, canonical, _, result = parse_and_qc(payload.smiles, payload.mol)
-    if not result or not result.mol:
+async def chem_3d(payload: Chem3DRequest) -> Chem3DResponse:
+    qc, result = await to_thread.run_sync(parse_and_sanitize, payload.smiles, payload.mol, limiter=_rdkit_limiter)
+    if not result.mol:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=respond_error("parse_failure", "无法解析分子结构"),
@@ -92,7 +170,7 @@ def chem_3d(payload: Chem3DRequest) -> Chem3DResponse:
             detail=respond_error("sanitize_failure", "分子结构未通过规范化校验", "；".join(qc.warnings)),
         )
 
-    molblock_3d, warnings_3d = generate_3d_molblock(result.mol)
+    molblock_3d, warnings_3d = await to_thread.run_sync(generate_3d_molblock, result.mol, limiter=_rdkit_limiter)
     if warnings_3d:
         qc.warnings.extend(warnings_3d)
     if not molblock_3d:
@@ -100,12 +178,21 @@ def chem_3d(payload: Chem3DRequest) -> Chem3DResponse:
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=respond_error("generate_3d_failure", "无法生成3D构象", "；".join(qc.warnings)),
         )
+    canonical = None
+    try:
+        canonical = await to_thread.run_sync(canonical_smiles, result.mol, limiter=_rdkit_limiter)
+    except Exception as exc:
+        qc.warnings.append(f"canonical_failure:{exc}")
     return Chem3DResponse(ok=True, canonical_smiles=canonical, molblock_3d=molblock_3d, qc=qc)
 
 
-@app.get("/api/tasks", response_model=list[Task])
-def list_tasks() -> list[Task]:
-    return store.list_tasks()
+_TASK_LIST_ADAPTER = TypeAdapter(tuple[Task, ...])
+
+
+# 任务列表由 pydantic-core 直接序列化为 JSON bytes，不再经过 response_model 的二次校验
+@app.get("/api/tasks", responses={200: {"model": list[Task]}})
+def list_tasks() -> Response:
+    return Response(_TASK_LIST_ADAPTER.dump_json(store.list_tasks()), media_type="application/json")
 
 
 @app.post("/api/tasks", response_model=list[Task], status_code=status.HTTP_201_CREATED)
@@ -152,21 +239,21 @@ def review_task(task_id: str, payload: ReviewRequest) -> Task:
 
 
 @app.get("/api/export")
-def export_data(format: str = Query(..., pattern="^(smiles|csv|sdf)$")) -> PlainTextResponse:
+def export_data(format: str = Query(..., pattern="^(smiles|csv|sdf)$")) -> StreamingResponse:
     mime = {
         "smiles": "text/plain",
         "csv": "text/csv",
         "sdf": "chemical/x-mdl-sdfile",
     }
     try:
-        payload = store.export(format)
+        chunks = store.export_iter(format)
     except ValueError as exc:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=respond_error("unsupported_format", str(exc)),
         )
-    return PlainTextResponse(
-        payload,
+    return StreamingResponse(
+        chunks,
         media_type=mime[format],
         headers={"Content-Disposition": f"attachment; filename=molecules.{format}"},
     )
@@ -2,9 +2,19 @@ from __future__ import annotations
 
 from datetime import datetime
 from enum import Enum
-from typing import List, Optional
+from typing import Annotated, List, Optional
 
-from pydantic import BaseModel, Field, field_validator, model_validator
+from pydantic import BaseModel, BeforeValidator, Field, field_validator, model_validator
+
+
+def _strip_empty(value):
+    if isinstance(value, str):
+        return value.strip() or None
+    return value
+
+
+# 去除首尾空白，空串视为未提供
+StrippedOptionalStr = Annotated[Optional[str], BeforeValidator(_strip_empty)]
 
 
 class TaskStatus(str, Enum):
@@ -28,16 +38,8 @@ class QCResult(BaseModel):
 
 
 class ChemParseRequest(BaseModel):
-    smiles: Optional[str] = None
-    mol: Optional[str] = None
-
-    @field_validator("smiles", "mol", mode="before")
-    @classmethod
-    def strip_empty(cls, value: Optional[str]) -> Optional[str]:
-        if value is None:
-            return None
-        stripped = value.strip()
-        return stripped or None
+    smiles: StrippedOptionalStr = None
+    mol: StrippedOptionalStr = None
 
     @model_validator(mode="after")
     def require_smiles_or_mol(self) -> "ChemParseRequest":
@@ -53,17 +55,31 @@ class ChemParseResponse(BaseModel):
     qc: QCResult
 
 
-class Chem3DRequest(BaseModel):
-    smiles: Optional[str] = None
-    mol: Optional[str] = None
+# 单次批量解析的条数上限，防止一个请求占满 RDKit 算力
+MAX_PARSE_BATCH_ITEMS = 200
+
+
+class ChemParseBatchItem(BaseModel):
+    # 不要求 smiles/mol 至少有一个：缺失输入在该条结果中报告，不让整批 422
+    smiles: StrippedOptionalStr = None
+    mol: StrippedOptionalStr = None
 
-    @field_validator("smiles", "mol", mode="before")
-    @classmethod
-    def strip_empty(cls, value: Optional[str]) -> Optional[str]:
-        if value is None:
-            return None
-        stripped = value.strip()
-        return stripped or None
+
+class ChemParseBatchRequest(BaseModel):
+    items: List[ChemParseBatchItem] = Field(max_length=MAX_PARSE_BATCH_ITEMS)
+
+
+class ChemParseBatchResult(ChemParseResponse):
+    error: Optional[ErrorResponse] = None
+
+
+class ChemParseBatchResponse(BaseModel):
+    results: List[ChemParseBatchResult]
+
+
+class Chem3DRequest(BaseModel):
+    smiles: StrippedOptionalStr = None
+    mol: StrippedOptionalStr = None
 
     @model_validator(mode="after")
     def require_smiles_or_mol(self) -> "Chem3DRequest":
@@ -92,6 +108,8 @@ class Annotation(BaseModel):
     molblock: Optional[str]
     qc: QCResult
     submitted_at: datetime
+    # smiles 是否为绘图器 JSON：提交与加载时填入，只供导出使用，不序列化、不持久化
+    is_structured_json: Optional[bool] = Field(default=None, exclude=True)
 
 
 class Review(BaseModel):
@@ -149,8 +167,8 @@ class ClaimRequest(BaseModel):
 
 class SubmitRequest(BaseModel):
     annotator: str
-    smiles: Optional[str] = None
-    mol: Optional[str] = None
+    smiles: StrippedOptionalStr = None
+    mol: StrippedOptionalStr = None
 
     @field_validator("annotator", mode="before")
     @classmethod
@@ -166,14 +184,6 @@ class SubmitRequest(BaseModel):
             raise ValueError("annotator is required")
         return value
 
-    @field_validator("smiles", "mol", mode="before")
-    @classmethod
-    def strip_empty(cls, value: Optional[str]) -> Optional[str]:
-        if value is None:
-            return None
-        stripped = value.strip()
-        return stripped or None
-
     @model_validator(mode="after")
     def require_smiles_or_mol(self) -> "SubmitRequest":
         if not self.smiles and not self.mol:
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+from functools import lru_cache
 from typing import Optional, Tuple
 
 from ..schemas import QCResult
@@ -12,19 +13,28 @@ from .rdkit_service import (
 )
 
 
-def parse_and_qc(
-    smiles: Optional[str], mol: Optional[str]
-) -> Tuple[QCResult, Optional[str], Optional[str], Optional[RDKitParseResult]]:
+def parse_and_sanitize(smiles: Optional[str], mol: Optional[str]) -> Tuple[QCResult, RDKitParseResult]:
+    """只做解析与规范化校验，不生成 canonical SMILES 与 molblock"""
     result = build_molecule(smiles, mol)
     qc = QCResult(rdkit_parse_ok=bool(result.mol), sanitize_ok=False, warnings=list(result.warnings))
-    canonical = None
-    molblock = None
 
     if result.mol:
         sanitized, detail = sanitize_molecule(result.mol)
         qc.sanitize_ok = sanitized
         if detail:
             qc.warnings.append(f"sanitize_error:{detail}")
+
+    return qc, result
+
+
+def parse_and_qc(
+    smiles: Optional[str], mol: Optional[str]
+) -> Tuple[QCResult, Optional[str], Optional[str], Optional[RDKitParseResult]]:
+    qc, result = parse_and_sanitize(smiles, mol)
+    canonical = None
+    molblock = None
+
+    if result.mol:
         try:
             canonical = canonical_smiles(result.mol)
         except Exception as exc:
@@ -35,3 +45,21 @@ def parse_and_qc(
             qc.warnings.append(f"molblock_failure:{exc}")
 
     return qc, canonical, molblock, result
+
+
+@lru_cache(maxsize=4096)
+def _parse_and_qc_cached(
+    smiles: Optional[str], mol: Optional[str]
+) -> Tuple[bool, bool, Tuple[str, ...], Optional[str], Optional[str]]:
+    # QCResult 可变，缓存中只保存不可变的元组
+    qc, canonical, molblock, _ = parse_and_qc(smiles, mol)
+    return qc.rdkit_parse_ok, qc.sanitize_ok, tuple(qc.warnings), canonical, molblock
+
+
+def cached_parse_and_qc(
+    smiles: Optional[str], mol: Optional[str]
+) -> Tuple[QCResult, Optional[str], Optional[str]]:
+    """与 parse_and_qc 相同，但结果按输入缓存，且不返回 RDKit Mol 对象"""
+    parse_ok, sanitize_ok, warnings, canonical, molblock = _parse_and_qc_cached(smiles, mol)
+    qc = QCResult(rdkit_parse_ok=parse_ok, sanitize_ok=sanitize_ok, warnings=list(warnings))
+    return qc, canonical, molblock
@@ -1,10 +1,21 @@
 from __future__ import annotations
 
+import os
+import re
 from typing import Optional, Tuple
 
 from rdkit import Chem
 from rdkit.Chem import AllChem
 
+# 3D 生成时嵌入并优化的构象数：取多个构象中能量最低者质量更好，但耗时随构象数近似线性增长，
+# 默认只生成 1 个，需要更优构象时可通过环境变量 MOL_3D_CONFORMERS 调大
+NUM_3D_CONFORMERS = max(1, int(os.environ.get("MOL_3D_CONFORMERS", "1")))
+
+# 与 str.split() 相同的空白字符集合（最大的空白码位是全角空格 U+3000）
+_WS_STRIP = {code: None for code in range(0x3001) if chr(code).isspace()}
+_JSON_MARKER_RE = re.compile(r'"(?:root|atoms|bonds|molecule|connections|templates)"')
+_FORMAT_MARKER_RE = re.compile(r'(M  END)|"(?:root|atoms|bonds|molecule|connections|templates)"')
+
 
 class RDKitParseResult:
     def __init__(self, mol: Optional[Chem.Mol], warnings: Optional[list[str]] = None):
@@ -18,27 +29,26 @@ def looks_like_structured_json(value: Optional[str]) -> bool:
     candidate = value.strip()
     if not candidate or not candidate.startswith("{"):
         return False
-    markers = ('"root"', '"atoms"', '"bonds"', '"molecule"', '"connections"', '"templates"')
-    return any(marker in candidate for marker in markers)
+    return _JSON_MARKER_RE.search(candidate) is not None
 
 
-def _looks_like_smiles(value: str) -> bool:
+def _detect_format(value: str) -> Tuple[bool, bool, bool]:
+    """一次扫描同时判断 (structured JSON, SMILES, molblock)"""
     candidate = value.strip()
     if not candidate:
-        return False
-    if "M  END" in candidate:
-        return False
-    return True
-
-
-def _looks_like_molblock(value: str) -> bool:
-    candidate = value.strip()
-    if not candidate:
-        return False
+        return False, False, False
+    json_like = candidate.startswith("{")
+    has_json_marker = False
     # molblock 至少要有结束标记
-    if "M  END" not in candidate:
-        return False
-    return True
+    has_molblock_end = False
+    for match in _FORMAT_MARKER_RE.finditer(candidate):
+        if match.group(1):
+            has_molblock_end = True
+        else:
+            has_json_marker = True
+        if has_molblock_end and (has_json_marker or not json_like):
+            break
+    return json_like and has_json_marker, not has_molblock_end, has_molblock_end
 
 
 def build_molecule(smiles: Optional[str], molblock: Optional[str]) -> RDKitParseResult:
@@ -46,18 +56,19 @@ def build_molecule(smiles: Optional[str], molblock: Optional[str]) -> RDKitParse
     warnings: list[str] = []
 
     if smiles:
-        if looks_like_structured_json(smiles):
+        is_json, is_smiles, _ = _detect_format(smiles)
+        if is_json:
             warnings.append("structured_json_payload")
-        elif _looks_like_smiles(smiles):
+        elif is_smiles:
             # 容错：去除所有空白字符，允许用户输入时出现换行/空格
-            normalized_smiles = "".join(smiles.split())
+            normalized_smiles = smiles.translate(_WS_STRIP)
             mol = Chem.MolFromSmiles(normalized_smiles)
             if mol is None:
                 warnings.append("smiles_parse_failed")
         else:
             warnings.append("smiles_format_invalid")
     if mol is None and molblock:
-        if _looks_like_molblock(molblock):
+        if _detect_format(molblock)[2]:
             mol = Chem.MolFromMolBlock(molblock, sanitize=False)
             if mol is None:
                 warnings.append("molblock_parse_failed")
@@ -89,25 +100,39 @@ def generate_3d_molblock(mol: Chem.Mol) -> Tuple[Optional[str], list[str]]:
     warnings: list[str] = []
 
     try:
-        working_mol = Chem.Mol(mol)
-        working_mol = Chem.AddHs(working_mol)
+        # AddHs 总是返回新的分子对象，不会修改传入的 mol
+        working_mol = Chem.AddHs(mol)
 
         params = AllChem.ETKDGv3()
         params.randomSeed = 0xF00D
-        embed_status = AllChem.EmbedMolecule(working_mol, params)
-        if embed_status != 0:
+        conf_ids = list(AllChem.EmbedMultipleConfs(working_mol, numConfs=NUM_3D_CONFORMERS, params=params))
+        if not conf_ids:
             warnings.append("embed_3d_failed")
             return None, warnings
 
+        # 多构象一次性批量优化，取能量最低者；MMFF 缺参数时回退到 UFF。
+        # 调用方已按 CPU 核数限流，这里只用单线程，避免并发请求各自再开满线程
+        best_conf_id = conf_ids[0]
         try:
-            optimize_status = AllChem.UFFOptimizeMolecule(working_mol, maxIters=400)
-            if optimize_status != 0:
-                warnings.append("uff_not_converged")
+            if AllChem.MMFFHasAllMoleculeParams(working_mol):
+                results = AllChem.MMFFOptimizeMoleculeConfs(
+                    working_mol, numThreads=1, maxIters=400, mmffVariant="MMFF94s"
+                )
+                not_converged_warning = "mmff_not_converged"
+            else:
+                results = AllChem.UFFOptimizeMoleculeConfs(working_mol, numThreads=1, maxIters=400)
+                not_converged_warning = "uff_not_converged"
+            converged = [(energy, cid) for cid, (status, energy) in zip(conf_ids, results) if status == 0]
+            if converged:
+                best_conf_id = min(converged)[1]
+            else:
+                warnings.append(not_converged_warning)
+                best_conf_id = min((energy, cid) for cid, (_, energy) in zip(conf_ids, results))[1]
         except Exception as exc:
-            warnings.append(f"uff_optimize_error:{exc}")
+            warnings.append(f"force_field_optimize_error:{exc}")
 
         working_mol = Chem.RemoveHs(working_mol)
-        return Chem.MolToMolBlock(working_mol), warnings
+        return Chem.MolToMolBlock(working_mol, confId=best_conf_id), warnings
     except Exception as exc:
         warnings.append(f"generate_3d_failed:{exc}")
         return None, warnings
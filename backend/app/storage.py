@@ -1,13 +1,18 @@
 from __future__ import annotations
 
-import csv
-import io
-import json
-from datetime import datetime
+import itertools
+import logging
+import os
+import re
+import secrets
+import time
+from datetime import datetime, timezone
+from functools import partial
 from pathlib import Path
-from threading import Lock
-from typing import Dict, Iterable, List
-from uuid import uuid4
+from threading import Event, Lock, Thread
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import orjson
 
 from .schemas import (
     Annotation,
@@ -17,63 +22,392 @@ from .schemas import (
     ReviewRequest,
     SubmitRequest,
     Task,
+    TaskContext,
     TaskCreateRequest,
     TaskSeed,
     TaskSource,
     TaskStatus,
 )
-from .services.qc_service import parse_and_qc
+from .services.qc_service import cached_parse_and_qc
 from .services.rdkit_service import looks_like_structured_json
 
+logger = logging.getLogger(__name__)
+
 MANUAL_REVIEW_WARNING = "manual_review_required_json_payload"
+CSV_HEADER = "id,title,canonical_smiles,qc_warnings,review_comment,reviewed_at"
+
+# csv.writer（QUOTE_MINIMAL）需要加引号的字符
+_CSV_SPECIAL_RE = re.compile(r'[,"\r\n]')
+
+
+# 模块级绑定，取时间时省去一层 Python 函数调用与属性查找
+_utcnow = partial(datetime.now, timezone.utc)
+
+
+def _parse_datetime(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+def _task_from_record(record: dict) -> Task:
+    """由本模块自己写出的持久化记录重建 Task；数据可信，用 model_construct 跳过校验"""
+    annotation = record.get("annotation")
+    review = record.get("review")
+    if annotation:
+        annotation = Annotation.model_construct(
+            **{
+                **annotation,
+                "qc": QCResult.model_construct(**annotation["qc"]),
+                "submitted_at": _parse_datetime(annotation["submitted_at"]),
+                "is_structured_json": looks_like_structured_json(annotation.get("smiles")),
+            }
+        )
+    if review:
+        review = Review.model_construct(
+            **{
+                **review,
+                "decision": TaskStatus(review["decision"]),
+                "reviewed_at": _parse_datetime(review["reviewed_at"]),
+            }
+        )
+    return Task.model_construct(
+        **{
+            **record,
+            "status": TaskStatus(record["status"]),
+            "source": TaskSource.model_construct(**record["source"]),
+            "claimed_at": _parse_datetime(record.get("claimed_at")),
+            "annotation": annotation,
+            "review": review,
+            "context": TaskContext.model_construct(**(record.get("context") or {})),
+        }
+    )
+
+
+def _interleave(separator: str, items: Iterable[str]) -> Iterator[str]:
+    first = True
+    for item in items:
+        if first:
+            first = False
+            yield item
+        else:
+            yield separator + item
+
+
+# 流式导出时每次最多合并的行数与字符数：逐行 yield 会让每一行都经历一次线程切换与 ASGI send
+EXPORT_CHUNK_ROWS = 500
+EXPORT_CHUNK_CHARS = 64 * 1024
+
+
+def _chunked(parts: Iterable[str]) -> Iterator[str]:
+    """把逐行内容合并成有界大小的块，内存占用仍与总量无关"""
+    buffer: list[str] = []
+    size = 0
+    for part in parts:
+        buffer.append(part)
+        size += len(part)
+        if len(buffer) >= EXPORT_CHUNK_ROWS or size >= EXPORT_CHUNK_CHARS:
+            yield "".join(buffer)
+            buffer.clear()
+            size = 0
+    if buffer:
+        yield "".join(buffer)
+
+
+def _smiles_line(annotation: Optional[Annotation]) -> Optional[str]:
+    if not annotation:
+        return None
+    if annotation.canonical_smiles:
+        return annotation.canonical_smiles
+    if not annotation.smiles:
+        return None
+    is_structured_json = annotation.is_structured_json
+    if is_structured_json is None:
+        # 未经提交或加载流程构造的 Annotation 没有判定结果，现场补算
+        is_structured_json = looks_like_structured_json(annotation.smiles)
+    return None if is_structured_json else annotation.smiles
+
+
+def _csv_field(value: str) -> str:
+    # 与 csv.writer 的 QUOTE_MINIMAL 一致：含特殊字符时整体加引号，内部引号双写
+    if _CSV_SPECIAL_RE.search(value):
+        return '"' + value.replace('"', '""') + '"'
+    return value
+
+
+def _csv_rows(tasks: Iterable[Task]) -> Iterator[str]:
+    # 行尾由 _interleave 统一补齐
+    def render(row: list[str]) -> str:
+        return ",".join(map(_csv_field, row))
+
+    yield CSV_HEADER
+    for task in tasks:
+        ann = task.annotation
+        rev = task.review
+        canonical = (ann.canonical_smiles or "") if ann else ""
+        warnings = ";".join(ann.qc.warnings) if ann else ""
+        comment = (rev.comment or "") if rev else ""
+        reviewed_at = rev.reviewed_at.isoformat() if rev and rev.reviewed_at else ""
+        yield render([task.id, task.title, canonical, warnings, comment, reviewed_at])
 
 
 class TaskStore:
-    def __init__(self, db_file: str = "tasks.json") -> None:
+    """内存任务表 + 磁盘持久化。
+
+    持久化由两部分组成：快照文件（db_file，完整任务列表）与追加写日志
+    （同名 .log 文件，每行一条变更记录）。变更只追加日志，日志行数同时达到
+    COMPACT_MIN_LINES 与任务数的 COMPACT_RATIO 倍时由后台线程压缩：先把日志换成
+    .log.old 并开一份新日志，再在锁外重写快照，成功后删除旧日志；
+    启动时依次读快照、旧日志、日志。
+    """
+
+    # 每个任务最多写 4 行日志（创建、领取、提交、审核），比例须小于 4 才可能触发
+    COMPACT_RATIO = 2
+    COMPACT_MIN_LINES = 1000
+
+    def __init__(self, db_file: str = "tasks.json", fsync_interval: float = 1.0) -> None:
         self._tasks: Dict[str, Task] = {}
-        self._lock = Lock()
+        # 按状态的二级索引，导出时无需全表扫描
+        self._by_status: Dict[TaskStatus, Dict[str, Task]] = {s: {} for s in TaskStatus}
+        self._list_cache: Optional[Tuple[Task, ...]] = None
+        # 每个任务一把锁，不同任务的状态校验与构造可并发；
+        # _map_lock 只保护两个字典的原地更新与读快照，_wal_lock 只保护日志追加。
+        # 需要同时持有时，先取 _map_lock 再取 _wal_lock
+        self._locks: Dict[str, Lock] = {}
+        self._map_lock = Lock()
+        self._wal_lock = Lock()
+        # 串行化压缩本身，不阻塞日志追加
+        self._compact_lock = Lock()
         self._db_file = Path(db_file)
+        self._log_file = self._db_file.with_suffix(".log")
+        # 压缩期间被换下的旧日志，快照写完前仍需参与重放
+        self._old_log_file = self._db_file.with_suffix(".log.old")
+        self._log_lines = 0
+        # 快照用的逐任务序列化缓存：task_id -> (Task 对象, JSON bytes)
+        self._dump_cache: Dict[str, Tuple[Task, bytes]] = {}
+        self._fsync_interval = fsync_interval
+        self._last_fsync = time.monotonic()
+        # 是否有已写入但尚未 fsync 的日志，由后台线程按 fsync_interval 补刷
+        self._unsynced = False
         self._load_from_disk()
+        # 进程级随机前缀 + 自增序号，生成 ID 无需每次读取系统随机源；
+        # 前缀避开已持久化任务用过的，保证重启后新 ID 不会与旧 ID 冲突
+        self._id_prefix = self._new_id_prefix()
+        self._id_counter = itertools.count()
+        self._log_fp = open(self._log_file, "ab")
+        self._compact_needed = Event()
+        self._closing = False
+        self._compactor = Thread(target=self._compact_loop, name="task-store-compactor", daemon=True)
+        self._compactor.start()
 
     def _load_from_disk(self) -> None:
-        """从文件加载任务数据"""
+        """加载快照并重放日志"""
+        records: Dict[str, dict] = {}
         if self._db_file.exists():
             try:
-                with open(self._db_file, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                    for task_dict in data:
-                        task = Task(**task_dict)
-                        self._tasks[task.id] = task
-            except Exception as e:
-                print(f"加载任务数据失败: {e}")
-
-    def _save_to_disk(self) -> None:
-        """保存任务数据到文件"""
-        try:
-            with open(self._db_file, "w", encoding="utf-8") as f:
-                data = [task.model_dump() for task in self._tasks.values()]
-                json.dump(data, f, ensure_ascii=False, indent=2, default=str)
-        except Exception as e:
-            print(f"保存任务数据失败: {e}")
+                snapshot = orjson.loads(self._db_file.read_bytes())
+            except (OSError, ValueError) as e:
+                logger.warning("加载任务数据失败: %s", e)
+                snapshot = []
+            for task_dict in snapshot:
+                try:
+                    records[task_dict["id"]] = task_dict
+                except (KeyError, TypeError) as e:
+                    logger.warning("跳过缺少 id 的任务记录: %s", e)
+        for log_file in (self._old_log_file, self._log_file):
+            if not log_file.exists():
+                continue
+            with open(log_file, "r+b") as f:
+                end = 0
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        # 进程崩溃留下的半行记录：截回上一个换行符，否则之后追加的记录会接在它后面
+                        logger.warning("截断日志末尾不完整的记录: %s", log_file)
+                        f.truncate(end)
+                        break
+                    end += len(line)
+                    try:
+                        self._replay(records, orjson.loads(line))
+                    except (ValueError, KeyError, TypeError) as e:
+                        logger.warning("跳过无法重放的日志记录: %s", e)
+                        continue
+                    self._log_lines += 1
+        for task_id, task_dict in records.items():
+            try:
+                task = _task_from_record(task_dict)
+            except (ValueError, KeyError, TypeError) as e:
+                # 单条坏记录不应导致整个服务无法启动，跳过并记录
+                logger.warning("跳过无法加载的任务记录 %s: %s", task_id, e)
+                continue
+            self._tasks[task.id] = task
+            self._by_status[task.status][task.id] = task
 
-    def list_tasks(self) -> List[Task]:
-        return list(self._tasks.values())
+    @staticmethod
+    def _replay(records: Dict[str, dict], entry: dict) -> None:
+        if entry["op"] == "bulk_create":
+            for task_dict in entry["tasks"]:
+                records[task_dict["id"]] = task_dict
+        else:
+            records[entry["id"]].update(entry["fields"])
+
+    def _log_update(self, op: str, task: Task, fields: Iterable[str]) -> None:
+        """记录单个任务的字段变更，须在该任务的锁内调用以保证同一任务的记录有序"""
+        self._append_log({"op": op, "id": task.id, "fields": task.model_dump(mode="json", include=set(fields))})
+
+    def _append_log(self, entry: dict) -> None:
+        line = orjson.dumps(entry) + b"\n"
+        with self._wal_lock:
+            self._log_fp.write(line)
+            self._log_fp.flush()
+            self._log_lines += 1
+            now = time.monotonic()
+            if now - self._last_fsync >= self._fsync_interval:
+                os.fsync(self._log_fp.fileno())
+                self._last_fsync = now
+                self._unsynced = False
+            else:
+                self._unsynced = True
+            if self._log_lines >= max(self.COMPACT_MIN_LINES, self.COMPACT_RATIO * len(self._tasks)):
+                # 重写快照交给后台线程，请求路径只承担日志追加
+                self._compact_needed.set()
+
+    def _save_to_disk(self, tasks: Iterable[Task]) -> None:
+        """原子地重写快照文件，须在 self._compact_lock 内调用"""
+        parts = []
+        for task in tasks:
+            # Task 发布后不再原地修改，对象没变就说明序列化结果仍然有效
+            cached = self._dump_cache.get(task.id)
+            if cached is None or cached[0] is not task:
+                cached = (task, orjson.dumps(task.model_dump(mode="json")))
+                self._dump_cache[task.id] = cached
+            parts.append(cached[1])
+        tmp_file = self._db_file.with_suffix(".tmp")
+        with open(tmp_file, "wb") as f:
+            f.write(b"[" + b",".join(parts) + b"]")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self._db_file)
+
+    def _rotate_log(self) -> Tuple[Task, ...]:
+        """把当前日志换成旧日志并开一份新日志，返回此刻的任务快照，须同时持有 self._map_lock 与 self._wal_lock。
+
+        变更总是先发布到内存再写日志，因此返回的快照一定包含旧日志中的全部记录；
+        之后的变更写入新日志，重放时在快照之上重复应用是幂等的。
+        """
+        self._log_fp.close()
+        if self._old_log_file.exists():
+            # 上次压缩没能写出快照，旧日志仍需保留，把当前日志接在其后
+            with open(self._old_log_file, "ab") as f:
+                f.write(self._log_file.read_bytes())
+                f.flush()
+                os.fsync(f.fileno())
+            self._log_file.unlink()
+        else:
+            os.replace(self._log_file, self._old_log_file)
+        self._log_fp = open(self._log_file, "ab")
+        self._log_lines = 0
+        return tuple(self._tasks.values())
+
+    def _compact_loop(self) -> None:
+        while True:
+            triggered = self._compact_needed.wait(self._fsync_interval)
+            if self._closing:
+                return
+            try:
+                if triggered:
+                    self._compact_needed.clear()
+                    self.compact()
+                elif self._unsynced:
+                    # 一批写入之后不再有新的追加时，由这里把尾部记录刷到磁盘
+                    self.sync()
+            except Exception:
+                # 后台线程不能因单次失败退出，记录堆栈后继续等待
+                logger.exception("压缩或同步任务日志失败")
+
+    def compact(self) -> None:
+        """重写快照并丢弃已被快照覆盖的日志；只有换日志文件时短暂持有 _map_lock 与 _wal_lock"""
+        with self._compact_lock:
+            with self._map_lock, self._wal_lock:
+                tasks = self._rotate_log()
+            try:
+                self._save_to_disk(tasks)
+            except (OSError, TypeError) as e:
+                # 快照失败时保留旧日志，数据仍可通过重放恢复
+                logger.warning("保存任务数据失败: %s", e)
+                return
+            self._old_log_file.unlink()
+
+    def close(self) -> None:
+        """停止后台压缩线程，压缩一次后关闭日志文件"""
+        self._closing = True
+        self._compact_needed.set()
+        self._compactor.join()
+        self.compact()
+        with self._wal_lock:
+            self._log_fp.close()
+
+    def sync(self) -> None:
+        """把尚未落盘的日志强制刷到磁盘"""
+        with self._wal_lock:
+            self._log_fp.flush()
+            os.fsync(self._log_fp.fileno())
+            self._last_fsync = time.monotonic()
+            self._unsynced = False
+
+    def _publish(self, *updated: Task) -> None:
+        """原地更新任务字典与状态索引，须在 self._map_lock 内调用，开销与任务总数无关。
+
+        读路径不直接遍历这两个字典：list_tasks 返回在锁内构建的元组，导出在锁内复制状态桶。
+        """
+        for task in updated:
+            previous = self._tasks.get(task.id)
+            if previous is not None:
+                self._by_status[previous.status].pop(task.id, None)
+            self._by_status[task.status][task.id] = task
+            self._tasks[task.id] = task
+        self._list_cache = None
+
+    def list_tasks(self) -> Tuple[Task, ...]:
+        # 任何变更都会清空缓存；重建在 _map_lock 内完成，得到的是一致的快照
+        cached = self._list_cache
+        if cached is None:
+            with self._map_lock:
+                cached = self._list_cache
+                if cached is None:
+                    cached = tuple(self._tasks.values())
+                    self._list_cache = cached
+        return cached
 
     def create_tasks(self, payload: TaskCreateRequest) -> List[Task]:
-        with self._lock:
-            new_tasks = []
-            for seed in payload.items:
-                task_id = self._create_id()
-                task = Task(
-                    id=task_id,
-                    title=seed.title,
-                    status=TaskStatus.NEW,
-                    source=TaskSource(smiles=seed.source_smiles, mol=seed.source_mol),
-                )
-                self._tasks[task_id] = task
-                new_tasks.append(task)
-            self._save_to_disk()
-            return new_tasks
+        return self.create_tasks_bulk(payload.items)
+
+    def create_tasks_bulk(self, seeds: Iterable[TaskSeed]) -> List[Task]:
+        """批量创建任务，整批只写一条日志记录"""
+        # seed 已经过 TaskSeed 校验，这里用 model_construct 跳过重复校验
+        new_tasks = [
+            Task.model_construct(
+                id=self._create_id(),
+                title=seed.title,
+                status=TaskStatus.NEW,
+                source=TaskSource.model_construct(smiles=seed.source_smiles, mol=seed.source_mol),
+                claimed_by=None,
+                claimed_at=None,
+                annotation=None,
+                review=None,
+                context=TaskContext.model_construct(),
+            )
+            for seed in seeds
+        ]
+        entry = {"op": "bulk_create", "tasks": [task.model_dump(mode="json") for task in new_tasks]}
+        # 发布与写日志在同一把锁内完成：新任务一旦可见，其创建记录必然排在
+        # 任何针对它的 claim 记录之前（claim 发布时同样需要 _map_lock）
+        with self._map_lock:
+            self._publish(*new_tasks)
+            self._append_log(entry)
+        return new_tasks
+
+    def _task_lock(self, task_id: str) -> Lock:
+        self.get_task(task_id)
+        # dict.setdefault 在 GIL 下是原子的，并发首次访问也只会得到同一把锁
+        return self._locks.setdefault(task_id, Lock())
 
     def get_task(self, task_id: str) -> Task:
         try:
@@ -82,18 +416,51 @@ class TaskStore:
             raise KeyError(f"task {task_id} not found")
 
     def claim_task(self, task_id: str, request: ClaimRequest) -> Task:
-        with self._lock:
+        now = _utcnow()
+        with self._task_lock(task_id):
             task = self.get_task(task_id)
             if task.status != TaskStatus.NEW:
                 raise ValueError("cannot claim unless task is NEW")
-            task.status = TaskStatus.IN_PROGRESS
-            task.claimed_by = request.user
-            task.claimed_at = datetime.utcnow()
-            self._save_to_disk()
+            task = task.model_copy(
+                update={"status": TaskStatus.IN_PROGRESS, "claimed_by": request.user, "claimed_at": now}
+            )
+            with self._map_lock:
+                self._publish(task)
+            self._log_update("claim", task, ("status", "claimed_by", "claimed_at"))
             return task
 
     def submit_annotation(self, task_id: str, payload: SubmitRequest) -> Task:
-        with self._lock:
+        now = _utcnow()
+        # RDKit 解析与任务状态无关，放在锁外执行；相同结构的重复提交直接命中缓存
+        qc, canonical, molblock = cached_parse_and_qc(payload.smiles, payload.mol)
+        is_structured_json = looks_like_structured_json(payload.smiles)
+        manual_review_mode = is_structured_json and not payload.mol
+        rejection = None
+
+        # structured JSON（如绘图器序列化结果）进入人工审阅模式，不阻断提交
+        if manual_review_mode and not qc.rdkit_parse_ok:
+            warnings = qc.warnings if MANUAL_REVIEW_WARNING in qc.warnings else [*qc.warnings, MANUAL_REVIEW_WARNING]
+            qc = QCResult(rdkit_parse_ok=False, sanitize_ok=False, warnings=warnings)
+        # 提交时拦截明显错误：无法解析或规范化失败
+        elif not qc.rdkit_parse_ok:
+            detail = "；".join(qc.warnings) if qc.warnings else "rdkit_parse_failed"
+            rejection = f"RDKit 解析失败，无法提交：{detail}"
+        elif not qc.sanitize_ok:
+            detail = "；".join(qc.warnings) if qc.warnings else "sanitize_failed"
+            rejection = f"RDKit 校验失败，无法提交：{detail}"
+
+        annotation = Annotation(
+            annotator=payload.annotator,
+            smiles=payload.smiles,
+            mol=payload.mol,
+            canonical_smiles=canonical,
+            molblock=molblock,
+            qc=qc,
+            submitted_at=now,
+            is_structured_json=is_structured_json,
+        )
+
+        with self._task_lock(task_id):
             task = self.get_task(task_id)
             if task.status != TaskStatus.IN_PROGRESS:
                 raise ValueError("cannot submit unless task is IN_PROGRESS")
@@ -101,38 +468,18 @@ class TaskStore:
                 raise ValueError("cannot submit without claimed user")
             if task.claimed_by != payload.annotator:
                 raise ValueError("annotator does not match claimed user")
-            qc, canonical, molblock, _ = parse_and_qc(payload.smiles, payload.mol)
-            manual_review_mode = looks_like_structured_json(payload.smiles) and not payload.mol
+            if rejection:
+                raise ValueError(rejection)
 
-            # structured JSON（如绘图器序列化结果）进入人工审阅模式，不阻断提交
-            if manual_review_mode and not qc.rdkit_parse_ok:
-                warnings = list(dict.fromkeys([*qc.warnings, MANUAL_REVIEW_WARNING]))
-                qc = QCResult(rdkit_parse_ok=False, sanitize_ok=False, warnings=warnings)
-            else:
-                # 提交时拦截明显错误：无法解析或规范化失败
-                if not qc.rdkit_parse_ok:
-                    detail = "；".join(qc.warnings) if qc.warnings else "rdkit_parse_failed"
-                    raise ValueError(f"RDKit 解析失败，无法提交：{detail}")
-                if not qc.sanitize_ok:
-                    detail = "；".join(qc.warnings) if qc.warnings else "sanitize_failed"
-                    raise ValueError(f"RDKit 校验失败，无法提交：{detail}")
-
-            annotation = Annotation(
-                annotator=payload.annotator,
-                smiles=payload.smiles,
-                mol=payload.mol,
-                canonical_smiles=canonical,
-                molblock=molblock,
-                qc=qc,
-                submitted_at=datetime.utcnow(),
-            )
-            task.annotation = annotation
-            task.status = TaskStatus.SUBMITTED
-            self._save_to_disk()
+            task = task.model_copy(update={"annotation": annotation, "status": TaskStatus.SUBMITTED})
+            with self._map_lock:
+                self._publish(task)
+            self._log_update("submit", task, ("status", "annotation"))
             return task
 
     def review_task(self, task_id: str, payload: ReviewRequest) -> Task:
-        with self._lock:
+        now = _utcnow()
+        with self._task_lock(task_id):
             task = self.get_task(task_id)
             if task.status != TaskStatus.SUBMITTED:
                 raise ValueError("cannot review unless task is SUBMITTED")
@@ -150,55 +497,44 @@ class TaskStore:
                 reviewer=payload.reviewer,
                 decision=payload.decision,
                 comment=payload.comment,
-                reviewed_at=datetime.utcnow(),
+                reviewed_at=now,
             )
-            task.review = review
-            task.status = payload.decision
-            self._save_to_disk()
+            task = task.model_copy(update={"review": review, "status": payload.decision})
+            with self._map_lock:
+                self._publish(task)
+            self._log_update("review", task, ("status", "review"))
             return task
 
     def export(self, fmt: str) -> str:
-        approved = [t for t in self._tasks.values() if t.status == TaskStatus.APPROVED]
+        return "".join(self.export_iter(fmt))
+
+    def export_iter(self, fmt: str) -> Iterator[str]:
+        """按有界大小的块生成导出内容，供流式响应使用；格式非法时立即抛出 ValueError"""
+        with self._map_lock:
+            approved = tuple(self._by_status[TaskStatus.APPROVED].values())
         if fmt == "smiles":
-            lines: list[str] = []
-            for task in approved:
-                annotation = task.annotation
-                if not annotation:
-                    continue
-                if annotation.canonical_smiles:
-                    lines.append(annotation.canonical_smiles)
-                    continue
-                if annotation.smiles and not looks_like_structured_json(annotation.smiles):
-                    lines.append(annotation.smiles)
-            return "\n".join(lines)
+            lines = (line for line in (_smiles_line(task.annotation) for task in approved) if line)
+            return _chunked(_interleave("\n", lines))
         if fmt == "csv":
-            headers = ["id", "title", "canonical_smiles", "qc_warnings", "review_comment", "reviewed_at"]
-            output = io.StringIO()
-            writer = csv.writer(output)
-            writer.writerow(headers)
-            for task in approved:
-                canonical = (task.annotation and task.annotation.canonical_smiles) or ""
-                warnings = task.annotation and ";".join(task.annotation.qc.warnings)
-                comment = (task.review and task.review.comment) or ""
-                reviewed_at = (task.review and task.review.reviewed_at.isoformat()) or ""
-                writer.writerow([task.id, task.title, canonical, warnings or "", comment, reviewed_at])
-            return output.getvalue().rstrip("\r\n")
+            return _chunked(_interleave("\r\n", _csv_rows(approved)))
         if fmt == "sdf":
-            blocks = []
-            for task in approved:
-                molblock = task.annotation and task.annotation.molblock
-                if molblock:
-                    blocks.append(molblock)
-            return "\n$$$$\n".join(blocks)
+            blocks = (t.annotation.molblock for t in approved if t.annotation and t.annotation.molblock)
+            return _chunked(_interleave("\n$$$$\n", blocks))
         raise ValueError("unsupported export format")
 
     def seed(self, seeds: Iterable[TaskSeed]) -> None:
         # 如果已经有数据，不重新seed
         if self._tasks:
-            print(f"已有 {len(self._tasks)} 个任务，跳过seed")
+            logger.info("已有 %d 个任务，跳过seed", len(self._tasks))
             return
-        request = TaskCreateRequest(items=list(seeds))
-        self.create_tasks(request)
+        self.create_tasks_bulk(seeds)
+
+    def _new_id_prefix(self) -> str:
+        used = {task_id[5:11] for task_id in self._tasks}
+        prefix = secrets.token_hex(3)
+        while prefix in used:
+            prefix = secrets.token_hex(3)
+        return prefix
 
     def _create_id(self) -> str:
-        return f"task_{uuid4().hex[:8]}"
+        return f"task_{self._id_prefix}{next(self._id_counter):08x}"
@@ -0,0 +1,44 @@
+import os
+import shutil
+import tempfile
+
+import pytest
+from fastapi.testclient import TestClient
+
+# 必须在导入 main 之前设置：main 导入时就会创建 TaskStore，打开日志文件并启动后台线程
+_STORE_DIR = tempfile.mkdtemp(prefix="task-store-")
+os.environ["TASKS_DB_FILE"] = os.path.join(_STORE_DIR, "tasks.json")
+
+from backend.app import main  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def client():
+    # 测试使用临时目录中的数据文件，不会读写仓库里的 tasks.json / tasks.log
+    yield TestClient(main.app)
+    main.store.close()
+    shutil.rmtree(_STORE_DIR, ignore_errors=True)
+
+
+@pytest.fixture
+def create_task(client):
+    def _create(title: str, source_smiles: str = "CC") -> str:
+        response = client.post("/api/tasks", json={"items": [{"title": title, "source_smiles": source_smiles}]})
+        assert response.status_code == 201
+        return response.json()[0]["id"]
+
+    return _create
+
+
+@pytest.fixture
+def claimed_task(client, create_task):
+    task_id = create_task("claimed")
+    assert client.post(f"/api/tasks/{task_id}/claim", json={"user": "alice"}).status_code == 200
+    return task_id
+
+
+@pytest.fixture
+def submitted_task(client, claimed_task):
+    response = client.post(f"/api/tasks/{claimed_task}/submit", json={"annotator": "alice", "smiles": "CC"})
+    assert response.status_code == 200
+    return claimed_task
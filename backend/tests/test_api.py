@@ -1,14 +1,23 @@
 import csv
 import io
 
-from fastapi.testclient import TestClient
-
-from backend.app.main import app
-
-client = TestClient(app)
-
-
-def test_chem_parse_success():
+from backend.app.schemas import MAX_PARSE_BATCH_ITEMS
+
+KETCHER_LIKE_JSON = """{
+  "root": {
+    "nodes": [{"$ref": "mol0"}],
+    "connections": [],
+    "templates": []
+  },
+  "mol0": {
+    "type": "molecule",
+    "atoms": [{"label": "C"}, {"label": "O"}],
+    "bonds": [{"type": 1, "atoms": [0, 1]}]
+  }
+}"""
+
+
+def test_chem_parse_success(client):
     response = client.post("/api/chem/parse", json={"smiles": "CCO"})
     assert response.status_code == 200
     payload = response.json()
@@ -16,7 +25,36 @@ def test_chem_parse_success():
     assert payload["qc"]["rdkit_parse_ok"]
 
 
-def test_chem_3d_success():
+def test_chem_parse_batch_reports_per_item_errors(client):
+    response = client.post(
+        "/api/chem/parse_batch",
+        json={"items": [{"smiles": "CCO"}, {"smiles": "C1CC"}, {"smiles": "c1ccccc1"}]},
+    )
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert len(results) == 3
+    assert results[0]["canonical_smiles"] == "CCO"
+    assert results[0]["error"] is None
+    assert results[1]["ok"] is False
+    assert results[1]["error"]["code"] == "parse_failure"
+    assert results[2]["canonical_smiles"] == "c1ccccc1"
+
+
+def test_chem_parse_batch_reports_missing_input_per_item(client):
+    response = client.post("/api/chem/parse_batch", json={"items": [{"smiles": "CCO"}, {}, {"smiles": "  "}]})
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert results[0]["error"] is None
+    assert [r["error"]["code"] for r in results[1:]] == ["missing_input", "missing_input"]
+
+
+def test_chem_parse_batch_rejects_oversized_batch(client):
+    items = [{"smiles": "CCO"}] * (MAX_PARSE_BATCH_ITEMS + 1)
+    response = client.post("/api/chem/parse_batch", json={"items": items})
+    assert response.status_code == 422
+
+
+def test_chem_3d_success(client):
     response = client.post("/api/chem/3d", json={"smiles": "CCO"})
     assert response.status_code == 200
     payload = response.json()
@@ -25,20 +63,17 @@ def test_chem_3d_success():
     assert "M  END" in payload["molblock_3d"]
 
 
-def test_task_flow_and_export():
-    create_resp = client.post("/api/tasks", json={"items": [{"title": "flow-1", "source_smiles": "CC"}]})
-    assert create_resp.status_code == 201
-    task = create_resp.json()[0]
-    task_id = task["id"]
-
-    claim_resp = client.post(f"/api/tasks/{task_id}/claim", json={"user": "alice"})
-    assert claim_resp.status_code == 200
+def test_list_tasks_returns_json_array(client, create_task):
+    task_id = create_task("list-me")
+    response = client.get("/api/tasks")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert task_id in [task["id"] for task in response.json()]
 
-    submit_resp = client.post(f"/api/tasks/{task_id}/submit", json={"annotator": "alice", "smiles": "CC"})
-    assert submit_resp.status_code == 200
 
+def test_task_flow_and_export(client, submitted_task):
     review_resp = client.post(
-        f"/api/tasks/{task_id}/review",
+        f"/api/tasks/{submitted_task}/review",
         json={"reviewer": "bob", "decision": "APPROVED", "comment": "looks good"},
     )
     assert review_resp.status_code == 200
@@ -48,91 +83,49 @@ def test_task_flow_and_export():
     assert "CC" in export_resp.text
 
 
-def test_submit_invalid_structure_rejected_by_rdkit():
-    create_resp = client.post("/api/tasks", json={"items": [{"title": "invalid-structure", "source_smiles": "CC"}]})
-    assert create_resp.status_code == 201
-    task = create_resp.json()[0]
-    task_id = task["id"]
-
-    claim_resp = client.post(f"/api/tasks/{task_id}/claim", json={"user": "alice"})
-    assert claim_resp.status_code == 200
-
+def test_submit_invalid_structure_rejected_by_rdkit(client, claimed_task):
     # 非法 SMILES：环闭合不完整
-    submit_resp = client.post(f"/api/tasks/{task_id}/submit", json={"annotator": "alice", "smiles": "C1CC"})
+    submit_resp = client.post(f"/api/tasks/{claimed_task}/submit", json={"annotator": "alice", "smiles": "C1CC"})
     assert submit_resp.status_code == 400
 
 
-def test_submit_requires_claim_first():
-    create_resp = client.post("/api/tasks", json={"items": [{"title": "submit-needs-claim", "source_smiles": "CC"}]})
-    assert create_resp.status_code == 201
-    task_id = create_resp.json()[0]["id"]
+def test_submit_requires_claim_first(client, create_task):
+    task_id = create_task("submit-needs-claim")
 
     submit_resp = client.post(f"/api/tasks/{task_id}/submit", json={"annotator": "alice", "smiles": "CC"})
     assert submit_resp.status_code == 400
 
 
-def test_submit_requires_same_annotator_as_claimed_user():
-    create_resp = client.post("/api/tasks", json={"items": [{"title": "submit-annotator-mismatch", "source_smiles": "CC"}]})
-    assert create_resp.status_code == 201
-    task_id = create_resp.json()[0]["id"]
-
-    claim_resp = client.post(f"/api/tasks/{task_id}/claim", json={"user": "alice"})
-    assert claim_resp.status_code == 200
-
-    submit_resp = client.post(f"/api/tasks/{task_id}/submit", json={"annotator": "bob", "smiles": "CC"})
+def test_submit_requires_same_annotator_as_claimed_user(client, claimed_task):
+    submit_resp = client.post(f"/api/tasks/{claimed_task}/submit", json={"annotator": "bob", "smiles": "CC"})
     assert submit_resp.status_code == 400
 
 
-def test_submit_structured_json_allows_manual_review_flow():
-    create_resp = client.post("/api/tasks", json={"items": [{"title": "json-structure", "source_smiles": "CC"}]})
-    assert create_resp.status_code == 201
-    task_id = create_resp.json()[0]["id"]
-
-    claim_resp = client.post(f"/api/tasks/{task_id}/claim", json={"user": "alice"})
-    assert claim_resp.status_code == 200
-
-    ketcher_like_json = """{
-      "root": {
-        "nodes": [{"$ref": "mol0"}],
-        "connections": [],
-        "templates": []
-      },
-      "mol0": {
-        "type": "molecule",
-        "atoms": [{"label": "C"}, {"label": "O"}],
-        "bonds": [{"type": 1, "atoms": [0, 1]}]
-      }
-    }"""
-    submit_resp = client.post(f"/api/tasks/{task_id}/submit", json={"annotator": "alice", "smiles": ketcher_like_json})
+def test_submit_structured_json_allows_manual_review_flow(client, claimed_task):
+    submit_resp = client.post(
+        f"/api/tasks/{claimed_task}/submit", json={"annotator": "alice", "smiles": KETCHER_LIKE_JSON}
+    )
     assert submit_resp.status_code == 200
     submit_payload = submit_resp.json()
     assert submit_payload["status"] == "SUBMITTED"
     assert "manual_review_required_json_payload" in submit_payload["annotation"]["qc"]["warnings"]
+    assert "is_structured_json" not in submit_payload["annotation"]
 
     review_resp = client.post(
-        f"/api/tasks/{task_id}/review",
+        f"/api/tasks/{claimed_task}/review",
         json={"reviewer": "bob", "decision": "APPROVED", "comment": "manual json review passed"},
     )
     assert review_resp.status_code == 200
     assert review_resp.json()["status"] == "APPROVED"
 
 
-def test_claim_invalid_state_rejected():
-    create_resp = client.post("/api/tasks", json={"items": [{"title": "claim-invalid", "source_smiles": "CC"}]})
-    assert create_resp.status_code == 201
-    task_id = create_resp.json()[0]["id"]
-
-    first_claim = client.post(f"/api/tasks/{task_id}/claim", json={"user": "alice"})
-    assert first_claim.status_code == 200
-
-    second_claim = client.post(f"/api/tasks/{task_id}/claim", json={"user": "bob"})
+def test_claim_invalid_state_rejected(client, claimed_task):
+    second_claim = client.post(f"/api/tasks/{claimed_task}/claim", json={"user": "bob"})
     assert second_claim.status_code == 400
 
 
-def test_review_requires_submitted_status():
-    create_resp = client.post("/api/tasks", json={"items": [{"title": "review-invalid", "source_smiles": "CC"}]})
-    assert create_resp.status_code == 201
-    task_id = create_resp.json()[0]["id"]
+def test_review_requires_submitted_status(client, create_task):
+    task_id = create_task("review-invalid")
 
     review_resp = client.post(
         f"/api/tasks/{task_id}/review",
@@ -141,68 +134,41 @@ def test_review_requires_submitted_status():
     assert review_resp.status_code == 400
 
 
-def test_review_accepts_lowercase_and_status_alias():
-    create_resp = client.post("/api/tasks", json={"items": [{"title": "review-compat", "source_smiles": "CC"}]})
-    assert create_resp.status_code == 201
-    task_id = create_resp.json()[0]["id"]
-
-    claim_resp = client.post(f"/api/tasks/{task_id}/claim", json={"user": "alice"})
-    assert claim_resp.status_code == 200
-    submit_resp = client.post(f"/api/tasks/{task_id}/submit", json={"annotator": "alice", "smiles": "CC"})
-    assert submit_resp.status_code == 200
-
-    # lowercase decision
-    review_resp_lower = client.post(
-        f"/api/tasks/{task_id}/review",
+def test_review_accepts_lowercase_decision(client, submitted_task):
+    review_resp = client.post(
+        f"/api/tasks/{submitted_task}/review",
         json={"reviewer": "bob", "decision": "approved", "comment": "lowercase accepted"},
     )
-    assert review_resp_lower.status_code == 200
-    assert review_resp_lower.json()["status"] == "APPROVED"
-
-    # reset another task to test alias status field
-    create_resp2 = client.post("/api/tasks", json={"items": [{"title": "review-compat-alias", "source_smiles": "CC"}]})
-    assert create_resp2.status_code == 201
-    task_id2 = create_resp2.json()[0]["id"]
-    assert client.post(f"/api/tasks/{task_id2}/claim", json={"user": "alice"}).status_code == 200
-    assert client.post(f"/api/tasks/{task_id2}/submit", json={"annotator": "alice", "smiles": "CC"}).status_code == 200
-
-    review_resp_alias = client.post(
-        f"/api/tasks/{task_id2}/review",
+    assert review_resp.status_code == 200
+    assert review_resp.json()["status"] == "APPROVED"
+
+
+def test_review_accepts_status_alias(client, submitted_task):
+    review_resp = client.post(
+        f"/api/tasks/{submitted_task}/review",
         json={"reviewer": "bob", "status": "REJECTED", "comment": "status alias accepted"},
     )
-    assert review_resp_alias.status_code == 200
-    assert review_resp_alias.json()["status"] == "REJECTED"
-
+    assert review_resp.status_code == 200
+    assert review_resp.json()["status"] == "REJECTED"
 
-def test_review_without_comment_is_allowed():
-    create_resp = client.post("/api/tasks", json={"items": [{"title": "review-no-comment", "source_smiles": "CC"}]})
-    assert create_resp.status_code == 201
-    task_id = create_resp.json()[0]["id"]
-
-    assert client.post(f"/api/tasks/{task_id}/claim", json={"user": "alice"}).status_code == 200
-    assert client.post(f"/api/tasks/{task_id}/submit", json={"annotator": "alice", "smiles": "CC"}).status_code == 200
 
+def test_review_without_comment_is_allowed(client, submitted_task):
     review_resp = client.post(
-        f"/api/tasks/{task_id}/review",
+        f"/api/tasks/{submitted_task}/review",
         json={"reviewer": "bob", "decision": "APPROVED"},
     )
     assert review_resp.status_code == 200
     assert review_resp.json()["status"] == "APPROVED"
 
 
-def test_export_smiles_does_not_fallback_to_source_for_manual_review_only_records():
+def test_export_smiles_does_not_fallback_to_source_for_manual_review_only_records(client, create_task):
     unique_source = "N#N"
-    create_resp = client.post("/api/tasks", json={"items": [{"title": "export-no-source-fallback", "source_smiles": unique_source}]})
-    assert create_resp.status_code == 201
-    task_id = create_resp.json()[0]["id"]
+    task_id = create_task("export-no-source-fallback", source_smiles=unique_source)
 
     assert client.post(f"/api/tasks/{task_id}/claim", json={"user": "alice"}).status_code == 200
-
-    ketcher_like_json = """{
-      "root": {"nodes": [{"$ref": "mol0"}], "connections": [], "templates": []},
-      "mol0": {"type": "molecule", "atoms": [{"label": "C"}], "bonds": []}
-    }"""
-    assert client.post(f"/api/tasks/{task_id}/submit", json={"annotator": "alice", "smiles": ketcher_like_json}).status_code == 200
+    assert client.post(
+        f"/api/tasks/{task_id}/submit", json={"annotator": "alice", "smiles": KETCHER_LIKE_JSON}
+    ).status_code == 200
     assert client.post(
         f"/api/tasks/{task_id}/review",
         json={"reviewer": "bob", "decision": "APPROVED", "comment": "manual approve"},
@@ -213,14 +179,7 @@ def test_export_smiles_does_not_fallback_to_source_for_manual_review_only_record
     assert unique_source not in export_resp.text
 
 
-def test_export_csv_escapes_comment_fields():
-    create_resp = client.post("/api/tasks", json={"items": [{"title": "csv-escape", "source_smiles": "CC"}]})
-    assert create_resp.status_code == 201
-    task_id = create_resp.json()[0]["id"]
-
-    assert client.post(f"/api/tasks/{task_id}/claim", json={"user": "alice"}).status_code == 200
-    assert client.post(f"/api/tasks/{task_id}/submit", json={"annotator": "alice", "smiles": "CC"}).status_code == 200
-    comment = 'line1,with,comma\nline2 "quoted"'
+def _approve_and_export_csv_row(client, task_id: str, comment: str) -> dict:
     assert client.post(
         f"/api/tasks/{task_id}/review",
         json={"reviewer": "bob", "decision": "APPROVED", "comment": comment},
@@ -231,9 +190,21 @@ def test_export_csv_escapes_comment_fields():
     reader = csv.DictReader(io.StringIO(export_resp.text))
     matched = [row for row in reader if row["id"] == task_id]
     assert len(matched) == 1
-    assert matched[0]["review_comment"] == comment
+    return matched[0]
+
+
+def test_export_csv_escapes_comment_fields(client, submitted_task):
+    comment = 'line1,with,comma\nline2 "quoted"'
+    row = _approve_and_export_csv_row(client, submitted_task, comment)
+    assert row["review_comment"] == comment
+
+
+def test_export_csv_quotes_multiline_comment_without_comma(client, submitted_task):
+    comment = "line1\nline2"
+    row = _approve_and_export_csv_row(client, submitted_task, comment)
+    assert row["review_comment"] == comment
 
 
-def test_export_invalid_format():
+def test_export_invalid_format(client):
     response = client.get("/api/export", params={"format": "xyz"})
     assert response.status_code == 422
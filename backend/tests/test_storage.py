@@ -0,0 +1,209 @@
+import json
+import time
+
+import orjson
+
+from backend.app.schemas import ClaimRequest, ReviewRequest, SubmitRequest, TaskSeed, TaskStatus
+from backend.app.storage import TaskStore
+
+
+def _run_lifecycle(store: TaskStore, count: int) -> list:
+    tasks = store.create_tasks_bulk(TaskSeed(title=f"Mol-{i:04d}", source_smiles="CCO") for i in range(count))
+    for task in tasks:
+        store.claim_task(task.id, ClaimRequest(user="alice"))
+        store.submit_annotation(task.id, SubmitRequest(annotator="alice", smiles="CCO"))
+        store.review_task(task.id, ReviewRequest(reviewer="bob", decision=TaskStatus.APPROVED))
+    return tasks
+
+
+def test_log_is_compacted_in_background(tmp_path):
+    db_file = tmp_path / "tasks.json"
+    log_file = db_file.with_suffix(".log")
+    store = TaskStore(str(db_file))
+    _run_lifecycle(store, 5)
+    # 每个任务至多 4 行日志，默认阈值下尚未触发
+    assert not db_file.exists()
+
+    extra = store.create_tasks_bulk([TaskSeed(title="extra", source_smiles="CC")])[0]
+    store.COMPACT_MIN_LINES = 0
+    store.claim_task(extra.id, ClaimRequest(user="alice"))
+    deadline = time.monotonic() + 5
+    while log_file.stat().st_size and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert log_file.stat().st_size == 0
+    assert TaskStore(str(db_file)).list_tasks() == store.list_tasks()
+
+
+def test_bad_snapshot_records_are_skipped(tmp_path):
+    db_file = tmp_path / "tasks.json"
+    store = TaskStore(str(db_file))
+    _run_lifecycle(store, 1)
+    store.compact()
+    good = orjson.loads(db_file.read_bytes())[0]
+    bogus_status = {**good, "id": "task_bogus", "status": "BOGUS"}
+    missing_source = {key: value for key, value in good.items() if key != "source"}
+    missing_source["id"] = "task_nosource"
+    db_file.write_bytes(orjson.dumps([bogus_status, missing_source, good, {"title": "no id"}]))
+
+    reloaded = TaskStore(str(db_file))
+    assert [task.id for task in reloaded.list_tasks()] == [good["id"]]
+
+
+def test_reload_restores_mutated_tasks(tmp_path):
+    db_file = tmp_path / "tasks.json"
+    store = TaskStore(str(db_file))
+    tasks = _run_lifecycle(store, 3)
+    store.claim_task(store.create_tasks_bulk([TaskSeed(title="claimed", source_smiles="CC")])[0].id, ClaimRequest(user="bob"))
+
+    reloaded = TaskStore(str(db_file))
+    assert reloaded.list_tasks() == store.list_tasks()
+    assert reloaded.get_task(tasks[0].id).status == TaskStatus.APPROVED
+
+
+def test_truncated_last_log_line_is_skipped(tmp_path):
+    db_file = tmp_path / "tasks.json"
+    store = TaskStore(str(db_file))
+    first, second = store.create_tasks_bulk(
+        [TaskSeed(title="A", source_smiles="CC"), TaskSeed(title="B", source_smiles="CC")]
+    )
+    store.claim_task(first.id, ClaimRequest(user="alice"))
+    expected = store.list_tasks()
+    # 模拟进程在写日志时崩溃，只留下半行记录
+    with open(db_file.with_suffix(".log"), "ab") as f:
+        f.write(b'{"op":"claim","id":"')
+
+    reloaded = TaskStore(str(db_file))
+    assert reloaded.list_tasks() == expected
+    # 重启后追加的记录不能接在半行后面，再次重启仍须可见
+    reloaded.claim_task(second.id, ClaimRequest(user="bob"))
+    assert TaskStore(str(db_file)).get_task(second.id).status == TaskStatus.IN_PROGRESS
+
+
+def test_replay_after_crash_between_snapshot_and_old_log_removal(tmp_path):
+    db_file = tmp_path / "tasks.json"
+    store = TaskStore(str(db_file))
+    _run_lifecycle(store, 2)
+    with store._map_lock, store._wal_lock:
+        tasks = store._rotate_log()
+    # 换日志后到达的变更写入新日志
+    _run_lifecycle(store, 1)
+    # 快照已通过 os.replace 落盘，但旧日志尚未删除：重放两份日志须得到相同状态
+    store._save_to_disk(tasks)
+    assert db_file.with_suffix(".log.old").stat().st_size > 0
+
+    assert TaskStore(str(db_file)).list_tasks() == store.list_tasks()
+
+
+def test_close_compacts_and_stops_compactor(tmp_path):
+    db_file = tmp_path / "tasks.json"
+    store = TaskStore(str(db_file))
+    _run_lifecycle(store, 2)
+    store.close()
+
+    assert not store._compactor.is_alive()
+    assert db_file.with_suffix(".log").stat().st_size == 0
+    assert not db_file.with_suffix(".log.old").exists()
+    assert TaskStore(str(db_file)).list_tasks() == store.list_tasks()
+
+
+def test_legacy_indented_snapshot_loads(tmp_path):
+    db_file = tmp_path / "tasks.json"
+    legacy = [
+        {
+            "id": "task_ee63be43",
+            "title": "Mol-0001",
+            "status": "SUBMITTED",
+            "source": {"smiles": "CCO", "mol": None},
+            "claimed_by": "alice",
+            "claimed_at": "2026-02-17 18:14:58.123456",
+            "annotation": {
+                "annotator": "alice",
+                "smiles": "CCO",
+                "mol": None,
+                "canonical_smiles": "CCO",
+                "molblock": None,
+                "qc": {"rdkit_parse_ok": True, "sanitize_ok": True, "warnings": []},
+                "submitted_at": "2026-02-17 18:15:04.869930",
+            },
+            "review": None,
+            "context": {"ph": None, "solvent": None, "temperature": None},
+        }
+    ]
+    db_file.write_text(json.dumps(legacy, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    store = TaskStore(str(db_file))
+    task = store.get_task("task_ee63be43")
+    assert task.status == TaskStatus.SUBMITTED
+    assert task.annotation.canonical_smiles == "CCO"
+    assert task.annotation.submitted_at.year == 2026
+
+    # 旧记录缺少后加的字段，审核与导出仍须正常工作
+    store.review_task(task.id, ReviewRequest(reviewer="bob", decision=TaskStatus.APPROVED))
+    assert store.export("smiles") == "CCO"
+
+
+def test_failed_snapshot_keeps_old_log_for_next_compaction(tmp_path, monkeypatch):
+    db_file = tmp_path / "tasks.json"
+    store = TaskStore(str(db_file))
+    _run_lifecycle(store, 2)
+
+    def fail(tasks):
+        raise OSError("disk full")
+
+    with monkeypatch.context() as m:
+        m.setattr(store, "_save_to_disk", fail)
+        store.compact()
+    assert db_file.with_suffix(".log.old").exists()
+    assert TaskStore(str(db_file)).list_tasks() == store.list_tasks()
+
+    _run_lifecycle(store, 1)
+    store.compact()
+    assert not db_file.with_suffix(".log.old").exists()
+    assert TaskStore(str(db_file)).list_tasks() == store.list_tasks()
+
+
+def test_structured_json_flag_is_rebuilt_on_load_not_persisted(tmp_path):
+    db_file = tmp_path / "tasks.json"
+    store = TaskStore(str(db_file))
+    task = store.create_tasks_bulk([TaskSeed(title="json", source_smiles="N#N")])[0]
+    store.claim_task(task.id, ClaimRequest(user="alice"))
+    store.submit_annotation(task.id, SubmitRequest(annotator="alice", smiles='{"root": {"nodes": []}}'))
+    store.review_task(task.id, ReviewRequest(reviewer="bob", decision=TaskStatus.APPROVED))
+    assert b"is_structured_json" not in db_file.with_suffix(".log").read_bytes()
+
+    reloaded = TaskStore(str(db_file))
+    assert reloaded.get_task(task.id).annotation.is_structured_json is True
+    assert reloaded.export("smiles") == ""
+
+
+def test_export_iter_yields_bounded_chunks(tmp_path):
+    store = TaskStore(str(tmp_path / "tasks.json"))
+    _run_lifecycle(store, 1200)
+
+    chunks = list(store.export_iter("csv"))
+    assert 1 < len(chunks) < 10
+    assert "".join(chunks) == store.export("csv")
+    assert store.export("csv").count("\r\n") == 1200
+
+
+def test_trailing_writes_are_fsynced_without_further_appends(tmp_path):
+    store = TaskStore(str(tmp_path / "tasks.json"), fsync_interval=0.05)
+    store.create_tasks_bulk([TaskSeed(title="A", source_smiles="CC")])
+    assert store._unsynced
+
+    deadline = time.monotonic() + 5
+    while store._unsynced and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not store._unsynced
+
+
+def test_list_tasks_snapshot_is_refreshed_after_mutation(tmp_path):
+    store = TaskStore(str(tmp_path / "tasks.json"))
+    task = store.create_tasks_bulk([TaskSeed(title="A", source_smiles="CC")])[0]
+    before = store.list_tasks()
+    assert store.list_tasks() is before
+
+    store.claim_task(task.id, ClaimRequest(user="alice"))
+    after = store.list_tasks()
+    assert before[0].status == TaskStatus.NEW
+    assert after[0].status == TaskStatus.IN_PROGRESS